@@ -3,90 +3,246 @@ import yaml
 import sys
 import posixpath
 import os
+import marshal
+import stat
+import copy
+import contextlib
+import io
+import re
+from _codecs import utf_8_decode
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+
+_TAR_READ_BUFFER = 1 << 20
+_BINARY_SNIFF_SIZE = 512
+_TAIL_RE = re.compile(r'^-(\d+)$')
+_VFS_CACHE_SUFFIX = '.vfscache'
+_VFS_CACHE_VERSION = 5
+
+# Общий пустой словарь детей для всех обычных файлов
+_EMPTY_CHILDREN = MappingProxyType({})
+
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YAML_CACHE_MAXSIZE = 100
+# path -> (mtime, size, config)
+_YAML_CACHE = OrderedDict()
+
+@lru_cache(maxsize=4096)
+def _normpath(path):
+    path = posixpath.normpath(path)
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+    return path
+
+@lru_cache(maxsize=4096)
+def _joinpath(base, path):
+    return posixpath.join(base, path)
+
+def _is_simple(path):
+    # Путь без '.', '..', '//' и завершающего '/' нормализовать не нужно
+    return (path != '' and not path.endswith('/') and not path.startswith('.')
+            and '//' not in path and '/.' not in path)
 
 class VirtualFile:
+    __slots__ = ('name', 'is_dir', 'children', 'sorted_names', '_raw', '_decoded')
+
     def __init__(self, name, is_dir=False):
         self.name = name
         self.is_dir = is_dir
-        self.children = {}
-        self.content = ""
+        self.children = {} if is_dir else _EMPTY_CHILDREN
+        self.sorted_names = ()
+        self._raw = None
+        self._decoded = ""
+
+    @property
+    def content(self):
+        if self._raw is not None:
+            self._decoded = utf_8_decode(self._raw, 'replace', True)[0]
+            self._raw = None
+        return self._decoded
+
+    @content.setter
+    def content(self, value):
+        self._raw = None
+        self._decoded = value
+
+    def tail(self, lines=10):
+        # Ищем последние N переводов строки с конца, не разбивая весь файл на строки.
+        # Хвост после найденного '\n' режем splitlines, чтобы '\r', '\x0c' и т.п.
+        # тоже считались концами строк
+        buf = self._raw if self._raw is not None else self._decoded
+        newline = b'\n' if isinstance(buf, bytes) else '\n'
+        pos = -1
+        if lines > 0:
+            pos = len(buf)
+            if buf.endswith(newline):
+                pos -= 1
+            for _ in range(lines):
+                pos = buf.rfind(newline, 0, pos)
+                if pos < 0:
+                    break
+        chunk = buf[pos + 1:]
+        if isinstance(chunk, bytes):
+            chunk = utf_8_decode(chunk, 'replace', True)[0]
+        tail_lines = chunk.splitlines()
+        if lines > 0:
+            tail_lines = tail_lines[-lines:]
+        return '\n'.join(tail_lines)
 
 class VirtualFileSystem:
     def __init__(self, tar_path):
         self.root = VirtualFile("/", is_dir=True)
         self.current_path = "/"
-        self.load_tar(tar_path)
+        self.nodes = {"/": self.root}
+        if not self.load_cache(tar_path):
+            self.load_tar(tar_path)
+            self.save_cache(tar_path)
+
+    def load_cache(self, tar_path):
+        # Снимок хранится в marshal: только кортежи, строки и bytes, без выполнения кода
+        try:
+            st = os.stat(tar_path)
+            with open(tar_path + _VFS_CACHE_SUFFIX, 'rb') as f:
+                version, mtime, size, entries = marshal.load(f)
+            if version != _VFS_CACHE_VERSION or mtime != st.st_mtime or size != st.st_size:
+                return False
+            root = VirtualFile("/", is_dir=True)
+            nodes = {"/": root}
+            for path, is_dir, raw in entries:
+                parent_path, _, name = path.rpartition('/')
+                parent = nodes.get(parent_path or '/')
+                if parent is None or not parent.is_dir:
+                    continue
+                vf = VirtualFile(sys.intern(name), is_dir=is_dir)
+                vf._raw = raw
+                parent.children[vf.name] = vf
+                nodes[sys.intern(path)] = vf
+        except Exception:
+            return False
+        self.root = root
+        self.nodes = nodes
+        self.sort_children()
+        return True
+
+    def save_cache(self, tar_path):
+        cache_path = tar_path + _VFS_CACHE_SUFFIX
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            st = os.stat(tar_path)
+            # Родители в self.nodes всегда идут раньше своих детей
+            entries = tuple((path, node.is_dir, node._raw)
+                            for path, node in self.nodes.items() if path != '/')
+            with open(tmp_path, 'wb') as f:
+                marshal.dump((_VFS_CACHE_VERSION, st.st_mtime, st.st_size, entries), f)
+            os.replace(tmp_path, cache_path)
+        except (OSError, ValueError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
     def load_tar(self, tar_path):
-        if not tarfile.is_tarfile(tar_path):
+        raw = None
+        try:
+            raw = open(tar_path, 'rb', buffering=_TAR_READ_BUFFER)
+            tar = tarfile.open(fileobj=raw, mode='r|*')
+        except (OSError, tarfile.TarError):
+            if raw is not None:
+                raw.close()
             print(f"Tar archive {tar_path} does not exist or is not a valid tar file.")
             sys.exit(1)
-        with tarfile.open(tar_path, 'r') as tar:
-            for member in tar.getmembers():
-                if member.name in ['.', './', '']:
-                    continue
-                path = '/' + member.name.strip('/')
-                parts = path.split('/')
-
-                if parts[-1] == '':
+        # ссылка -> абсолютный путь её цели
+        links = {}
+        with raw, tar:
+            for member in tar:
+                parts = [sys.intern(part) for part in member.name.strip('/').split('/')
+                         if part and part != '.']
+                if not parts:
                     continue
+                leaf = parts[-1]
 
-                current = self.root
-                for part in parts[1:-1]:
-                    if part not in current.children:
-                        current.children[part] = VirtualFile(part, is_dir=True)
-                    current = current.children[part]
+                node = self.root
+                node_path = ""
+                for part in parts[:-1]:
+                    node_path += '/' + part
+                    child = node.children.get(part)
+                    if child is None or not child.is_dir:
+                        child = node.children[part] = VirtualFile(part, is_dir=True)
+                        self.nodes[sys.intern(node_path)] = child
+                    node = child
                 if member.isdir():
-                    current.children[parts[-1]] = VirtualFile(parts[-1], is_dir=True)
+                    vf = node.children.get(leaf)
+                    if vf is None or not vf.is_dir:
+                        vf = VirtualFile(leaf, is_dir=True)
                 else:
-                    vf = VirtualFile(parts[-1], is_dir=False)
-                    file_obj = tar.extractfile(member)
+                    vf = VirtualFile(leaf, is_dir=False)
+                    # В потоковом режиме ссылки через extractfile не прочитать,
+                    # их содержимое берём у цели после загрузки всего архива
+                    if member.issym():
+                        links[vf] = _normpath(_joinpath(node_path or '/', member.linkname))
+                    elif member.islnk():
+                        links[vf] = _normpath('/' + member.linkname)
+                    file_obj = tar.extractfile(member) if member.isfile() else None
                     if file_obj:
-                        try:
-                            vf.content = file_obj.read().decode('utf-8')
-                        except UnicodeDecodeError:
-                            vf.content = ""
-                    current.children[parts[-1]] = vf
+                        # Бинарные файлы (с NUL в начале) не читаем целиком и не храним
+                        head = file_obj.read(_BINARY_SNIFF_SIZE)
+                        if b'\x00' not in head:
+                            vf._raw = head + file_obj.read()
+                leaf_path = node_path + '/' + leaf
+                old = node.children.get(leaf)
+                if old is not None and old.is_dir and not vf.is_dir:
+                    # Файл заменил директорию: её содержимое больше недоступно
+                    prefix = leaf_path + '/'
+                    for path in [path for path in self.nodes if path.startswith(prefix)]:
+                        del self.nodes[path]
+                node.children[leaf] = vf
+                self.nodes[sys.intern(leaf_path)] = vf
+
+        for vf, target in links.items():
+            # Идём по цепочке ссылок до обычного файла; seen защищает от циклов
+            seen = {vf}
+            target_node = self.nodes.get(target)
+            while target_node in links and target_node not in seen:
+                seen.add(target_node)
+                target_node = self.nodes.get(links[target_node])
+            if target_node is not None and target_node not in links and not target_node.is_dir:
+                vf._raw = target_node._raw
+
+        self.sort_children()
+
+    def sort_children(self):
+        # ФС после загрузки не меняется, поэтому списки имён сортируем один раз
+        for node in self.nodes.values():
+            if node.is_dir:
+                node.sorted_names = tuple(sorted(node.children))
+
+    def resolve_path(self, path):
+        if _is_simple(path):
+            if path.startswith('/'):
+                return path
+            base = self.current_path
+            return (base + '/' + path) if base != '/' else '/' + path
+        if path == '/':
+            return path
+        if not posixpath.isabs(path):
+            path = _joinpath(self.current_path, path)
+        return _normpath(path)
 
     def get_node(self, path):
-        if posixpath.isabs(path):
-            path = path.lstrip('/')
-            current = self.root
-        else:
-            current = self.get_node(self.current_path)
-        
-        if path == "":
-            return current
-        parts = path.split('/')
-        for part in parts:
-            if part == "..":
-                if current == self.root:
-                    continue
-                parent = self.get_node(posixpath.dirname(self.current_path))
-                current = parent if parent else self.root
-            elif part == "." or part == "":
-                continue
-            else:
-                current = current.children.get(part)
-                if current is None:
-                    return None
-        return current
+        return self.nodes.get(self.resolve_path(path))
 
     def list_dir(self, path):
         node = self.get_node(path)
         if node and node.is_dir:
-            return sorted(node.children.keys())
+            return node.sorted_names
         return None
 
     def change_dir(self, path):
-        node = self.get_node(path)
+        abs_path = self.resolve_path(path)
+        node = self.nodes.get(abs_path)
         if node and node.is_dir:
-            if posixpath.isabs(path):
-                self.current_path = posixpath.normpath(path)
-            else:
-                self.current_path = posixpath.normpath(posixpath.join(self.current_path, path))
-            if not self.current_path.startswith('/'):
-                self.current_path = '/' + self.current_path
+            self.current_path = abs_path
             return True
         return False
 
@@ -96,8 +252,7 @@ class VirtualFileSystem:
     def read_tail(self, path, lines=10):
         node = self.get_node(path)
         if node and not node.is_dir:
-            content_lines = node.content.splitlines()
-            return '\n'.join(content_lines[-lines:])
+            return node.tail(lines)
         return None
 
 class ShellEmulator:
@@ -116,45 +271,67 @@ class ShellEmulator:
         self.running = True
 
     def load_config(self, config_path):
-        if not os.path.exists(config_path) or not os.path.isfile(config_path):
+        try:
+            st = os.stat(config_path)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
             print(f"Configuration file {config_path} does not exist.")
             sys.exit(1)
+        cached = _YAML_CACHE.get(config_path)
+        if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            _YAML_CACHE.move_to_end(config_path)
+            self.config = copy.deepcopy(cached[2])
+            return
         with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=_YAML_LOADER)
+        _YAML_CACHE[config_path] = (st.st_mtime, st.st_size, config)
+        if len(_YAML_CACHE) > _YAML_CACHE_MAXSIZE:
+            _YAML_CACHE.popitem(last=False)
+        self.config = copy.deepcopy(config)
 
     def run(self):
         if self.startup_script:
             self.execute_startup_script()
 
+        hostname = self.hostname
+        vfs = self.vfs
+        dispatch = self._dispatch
         while self.running:
             try:
-                cmd_input = input(f"{self.hostname}:{self.vfs.current_path}$ ").strip()
-                if not cmd_input:
-                    continue
-                parts = cmd_input.split()
-                cmd = parts[0]
-                args = parts[1:]
-                if cmd in self.commands:
-                    self.commands[cmd](args)
-                else:
-                    print(f"{cmd}: command not found")
+                cmd_input = input(f"{hostname}:{vfs.current_path}$ ").strip()
+                if cmd_input and not dispatch(cmd_input):
+                    print(f"{cmd_input.split(None, 1)[0]}: command not found")
             except (EOFError, KeyboardInterrupt):
                 print()
                 break
 
+    def _dispatch(self, line):
+        cmd, *rest = line.split(None, 1)
+        handler = self.commands.get(cmd)
+        if handler is None:
+            return False
+        handler(rest[0].split() if rest else [])
+        return True
+
     def execute_startup_script(self):
-        if not os.path.exists(self.startup_script) or not os.path.isfile(self.startup_script):
+        try:
+            f = open(self.startup_script, 'r')
+        except OSError:
             print(f"Startup script {self.startup_script} does not exist.")
             return
-        with open(self.startup_script, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    parts = line.split()
-                    cmd = parts[0]
-                    args = parts[1:]
-                    if cmd in self.commands:
-                        self.commands[cmd](args)
+        dispatch = self._dispatch
+        # Вывод скрипта копим в памяти и пишем в stdout одним вызовом
+        out = io.StringIO()
+        try:
+            with f, contextlib.redirect_stdout(out):
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        dispatch(line)
+        finally:
+            sys.stdout.write(out.getvalue())
+            sys.stdout.flush()
 
     def cmd_ls(self, args):
         path = args[0] if args else "."
@@ -184,21 +361,17 @@ class ShellEmulator:
         file_path = args[0]
         num_lines = 10  # По умолчанию читаем 10 строк
         if len(args) > 1 and args[1].startswith('-'):
-            try:
-                num_lines = int(args[1][1:])
-            except ValueError:
+            m = _TAIL_RE.match(args[1])
+            if m is None:
                 print(f"tail: invalid number of lines: '{args[1]}'")
                 return
-        
-        node = self.vfs.get_node(file_path)
-        if not node or node.is_dir:
+            num_lines = int(m.group(1))
+
+        tail = self.vfs.read_tail(file_path, num_lines)
+        if tail is None:
             print(f"tail: cannot open '{file_path}': No such file or directory")
             return
-        
-        # Разбиваем содержимое файла на строки и берём последние N строк
-        lines = node.content.splitlines()
-        tail_lines = lines[-num_lines:] if num_lines > 0 else lines
-        print("\n".join(tail_lines))
+        print(tail)
 
 
     def cmd_exit(self, args):
@@ -1,6 +1,13 @@
+import contextlib
+import io
 import os
+import shutil
+import tarfile
 import tempfile
 import unittest
+from unittest import mock
+
+import shell
 
 # Класс для файловой системы (VFS)
 class File:
@@ -109,5 +116,360 @@ class TestShellEmulator(unittest.TestCase):
         self.assertEqual(self.shell.vfs.read_tail("/test.txt", 2), "Line 4\nLine 5", "Ошибка в test_tail_custom_lines")
 
 
+# Создает tar-архив из списка (имя, тип, данные); тип: file, dir, sym, link
+def make_tar(tar_path, entries):
+    with tarfile.open(tar_path, 'w') as tar:
+        for name, kind, payload in entries:
+            info = tarfile.TarInfo(name)
+            if kind == 'file':
+                info.size = len(payload)
+                tar.addfile(info, io.BytesIO(payload))
+                continue
+            if kind == 'dir':
+                info.type = tarfile.DIRTYPE
+            elif kind == 'sym':
+                info.type = tarfile.SYMTYPE
+                info.linkname = payload
+            elif kind == 'link':
+                info.type = tarfile.LNKTYPE
+                info.linkname = payload
+            tar.addfile(info)
+
+
+# Тесты настоящей VirtualFileSystem из shell.py на сгенерированных архивах
+class VFSTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.tar_path = os.path.join(self.tmp_dir, "fs.tar")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self, entries):
+        make_tar(self.tar_path, entries)
+        return shell.VirtualFileSystem(self.tar_path)
+
+
+class TestVirtualFileSystemLinks(VFSTestCase):
+    def test_symlink_reads_target(self):
+        vfs = self.load([
+            ("d/real.txt", 'file', b"one\ntwo\n"),
+            ("d/link.txt", 'sym', "real.txt"),
+            ("d/dangling", 'sym', "/nowhere"),
+        ])
+        self.assertEqual(vfs.read_tail("/d/link.txt"), "one\ntwo")
+        self.assertEqual(vfs.read_tail("/d/dangling"), "")
+
+    def test_hardlink_reads_target(self):
+        vfs = self.load([
+            ("d/real.txt", 'file', b"one\ntwo\n"),
+            ("d/hard.txt", 'link', "d/real.txt"),
+        ])
+        self.assertEqual(vfs.read_tail("/d/hard.txt", 1), "two")
+
+    def test_symlink_chain_forward_reference(self):
+        vfs = self.load([
+            ("d/a", 'sym', "b"),
+            ("d/b", 'sym', "real"),
+            ("d/real", 'file', b"hi\n"),
+        ])
+        self.assertEqual(vfs.read_tail("/d/a"), "hi")
+        self.assertEqual(vfs.read_tail("/d/b"), "hi")
+
+    def test_symlink_cycle_reads_empty(self):
+        vfs = self.load([
+            ("d/a", 'sym', "b"),
+            ("d/b", 'sym', "a"),
+            ("d/self", 'sym', "self"),
+        ])
+        self.assertEqual(vfs.read_tail("/d/a"), "")
+        self.assertEqual(vfs.read_tail("/d/self"), "")
+
+
+class TestVirtualFileSystemLayout(VFSTestCase):
+    def test_file_replaced_by_directory(self):
+        vfs = self.load([
+            ("x", 'file', b"old\n"),
+            ("x/y", 'file', b"new\n"),
+        ])
+        self.assertTrue(vfs.get_node("/x").is_dir)
+        self.assertEqual(vfs.list_dir("/x"), ("y",))
+        self.assertEqual(vfs.read_tail("/x/y"), "new")
+
+
+class TestVirtualFileSystemCache(VFSTestCase):
+    entries = [
+        ("d/a.txt", 'file', b"one\ntwo\n"),
+        ("d/sub", 'dir', None),
+    ]
+
+    def test_cache_hit_skips_tar(self):
+        self.load(self.entries)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["fs.tar", "fs.tar.vfscache"])
+        with mock.patch.object(shell.VirtualFileSystem, 'load_tar') as load_tar:
+            vfs = shell.VirtualFileSystem(self.tar_path)
+        load_tar.assert_not_called()
+        self.assertEqual(vfs.list_dir("/d"), ("a.txt", "sub"))
+        self.assertEqual(vfs.read_tail("/d/a.txt", 1), "two")
+
+    def test_stale_mtime_reloads_tar(self):
+        self.load(self.entries)
+        st = os.stat(self.tar_path)
+        os.utime(self.tar_path, (st.st_atime, st.st_mtime + 10))
+        with mock.patch.object(shell.VirtualFileSystem, 'load_tar',
+                               autospec=True, side_effect=shell.VirtualFileSystem.load_tar) as load_tar:
+            shell.VirtualFileSystem(self.tar_path)
+        load_tar.assert_called_once()
+
+    def test_stale_size_reloads_tar(self):
+        self.load(self.entries)
+        st = os.stat(self.tar_path)
+        make_tar(self.tar_path, self.entries + [("d/b.txt", 'file', b"x" * 20480)])
+        os.utime(self.tar_path, (st.st_atime, st.st_mtime))
+        self.assertNotEqual(os.stat(self.tar_path).st_size, st.st_size)
+        vfs = shell.VirtualFileSystem(self.tar_path)
+        self.assertEqual(vfs.list_dir("/d"), ("a.txt", "b.txt", "sub"))
+
+    def test_corrupt_cache_falls_back(self):
+        self.load(self.entries)
+        with open(self.tar_path + ".vfscache", 'wb') as f:
+            f.write(b"\x00garbage")
+        vfs = shell.VirtualFileSystem(self.tar_path)
+        self.assertEqual(vfs.read_tail("/d/a.txt"), "one\ntwo")
+
+
+class TestVirtualFileTail(unittest.TestCase):
+    def make_file(self, raw):
+        vf = shell.VirtualFile("f")
+        vf._raw = raw
+        return vf
+
+    def test_tail_counts(self):
+        vf = self.make_file(b"a\nb\nc")
+        self.assertEqual(vf.tail(0), "a\nb\nc")
+        self.assertEqual(vf.tail(1), "c")
+        self.assertEqual(vf.tail(2), "b\nc")
+        self.assertEqual(vf.tail(10), "a\nb\nc")
+
+    def test_tail_trailing_newline(self):
+        vf = self.make_file(b"a\nb\n")
+        self.assertEqual(vf.tail(1), "b")
+        self.assertEqual(vf.tail(0), "a\nb")
+
+    def test_tail_crlf(self):
+        vf = self.make_file(b"a\r\nb\r\nc\r\n")
+        self.assertEqual(vf.tail(2), "b\nc")
+
+    def test_tail_other_line_breaks(self):
+        self.assertEqual(self.make_file(b"a\rb\rc").tail(1), "c")
+        self.assertEqual(self.make_file(b"a\nb\rc\x0cd\n").tail(2), "c\nd")
+        self.assertEqual(self.make_file("a\u2028b\x85c".encode()).tail(2), "b\nc")
+
+    def test_tail_matches_splitlines(self):
+        samples = ["", "a", "a\n", "\n\n\n", "x\n\ny\n", "a\r\nb", "a\rb\r", "a\x0c", "a\n\rb\n"]
+        for text in samples:
+            for n in (0, 1, 2, 3, 5):
+                expected = text.splitlines()[-n:] if n > 0 else text.splitlines()
+                with self.subTest(text=text, n=n):
+                    self.assertEqual(self.make_file(text.encode()).tail(n), "\n".join(expected))
+
+    def test_tail_invalid_utf8(self):
+        vf = self.make_file(b"ok\nbad \xff\n")
+        self.assertEqual(vf.tail(1), "bad \ufffd")
+        self.assertEqual(vf.content, "ok\nbad \ufffd\n")
+
+    def test_tail_after_content_decoded(self):
+        vf = self.make_file("раз\nдва\n".encode())
+        self.assertEqual(vf.content, "раз\nдва\n")
+        self.assertEqual(vf.tail(1), "два")
+
+
+class TestVirtualFileSystemReplace(VFSTestCase):
+    def test_late_directory_entry_keeps_children(self):
+        vfs = self.load([
+            ("a/b/c.txt", 'file', b"1\n"),
+            ("a/d", 'dir', None),
+            ("a", 'dir', None),
+        ])
+        self.assertEqual(vfs.list_dir("/a"), ("b", "d"))
+        self.assertEqual(vfs.read_tail("/a/b/c.txt"), "1")
+
+    def test_directory_replaced_by_file_cold_and_warm(self):
+        entries = [
+            ("a/b.txt", 'file', b"old\n"),
+            ("a/sub/c.txt", 'file', b"old\n"),
+            ("a", 'file', b"now a file\n"),
+            ("ab.txt", 'file', b"kept\n"),
+        ]
+        cold = self.load(entries)
+        self.assertTrue(os.path.exists(self.tar_path + ".vfscache"))
+        warm = shell.VirtualFileSystem(self.tar_path)
+        for vfs in (cold, warm):
+            self.assertIsNone(vfs.get_node("/a/b.txt"))
+            self.assertIsNone(vfs.get_node("/a/sub"))
+            self.assertIsNone(vfs.get_node("/a/sub/c.txt"))
+            self.assertEqual(vfs.read_tail("/a"), "now a file")
+            self.assertEqual(vfs.read_tail("/ab.txt"), "kept")
+            self.assertEqual(sorted(vfs.nodes), ["/", "/a", "/ab.txt"])
+
+
+class TestVirtualFileSystemBehaviour(VFSTestCase):
+    entries = [
+        ("a/b/c.txt", 'file', b"1\n2\n3\n"),
+        ("a/d", 'dir', None),
+        ("bin/tool", 'file', b"\x7fELF\x00\x01rest"),
+    ]
+
+    def test_list_dir_returns_sorted_tuple(self):
+        vfs = self.load(self.entries)
+        self.assertEqual(vfs.list_dir("/"), ("a", "bin"))
+        self.assertEqual(vfs.list_dir("/a"), ("b", "d"))
+        self.assertIsNone(vfs.list_dir("/a/b/c.txt"))
+
+    def test_dotdot_is_lexical(self):
+        vfs = self.load(self.entries)
+        self.assertTrue(vfs.change_dir("/a/b"))
+        self.assertEqual(vfs.read_tail("../b/c.txt", 1), "3")
+        self.assertEqual(vfs.list_dir("../.."), ("a", "bin"))
+        self.assertEqual(vfs.list_dir("../../a"), ("b", "d"))
+
+    def test_change_dir_resolution(self):
+        vfs = self.load(self.entries)
+        self.assertTrue(vfs.change_dir("a/b"))
+        self.assertEqual(vfs.print_working_directory(), "/a/b")
+        self.assertTrue(vfs.change_dir("../.."))
+        self.assertEqual(vfs.print_working_directory(), "/")
+        self.assertTrue(vfs.change_dir("//a//b/./"))
+        self.assertEqual(vfs.print_working_directory(), "/a/b")
+        self.assertTrue(vfs.change_dir("./../d"))
+        self.assertEqual(vfs.print_working_directory(), "/a/d")
+        self.assertTrue(vfs.change_dir("/.."))
+        self.assertEqual(vfs.print_working_directory(), "/")
+        self.assertFalse(vfs.change_dir("a/b/c.txt"))
+        self.assertFalse(vfs.change_dir("missing"))
+        self.assertEqual(vfs.print_working_directory(), "/")
+
+    def test_binary_file_has_no_content(self):
+        vfs = self.load(self.entries)
+        node = vfs.get_node("/bin/tool")
+        self.assertIsNone(node._raw)
+        self.assertEqual(vfs.read_tail("/bin/tool"), "")
+
+
+class TestShellEmulatorTail(VFSTestCase):
+    def setUp(self):
+        super().setUp()
+        make_tar(self.tar_path, [("f.txt", 'file', b"1\n2\n3\n")])
+        config_path = os.path.join(self.tmp_dir, "config.yaml")
+        with open(config_path, 'w') as f:
+            f.write(f"archive_path: {self.tar_path}\nhostname: test_host\n")
+        self.shell = shell.ShellEmulator(config_path)
+
+    def run_tail(self, args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.shell.cmd_tail(args)
+        return out.getvalue()
+
+    def test_tail_line_count(self):
+        self.assertEqual(self.run_tail(["/f.txt", "-2"]), "2\n3\n")
+
+    def test_tail_rejects_malformed_count(self):
+        self.assertEqual(self.run_tail(["/f.txt", "--3"]),
+                         "tail: invalid number of lines: '--3'\n")
+
+    def test_tail_missing_file(self):
+        self.assertEqual(self.run_tail(["/nope"]),
+                         "tail: cannot open '/nope': No such file or directory\n")
+
+
+class TestVirtualFileSystemErrors(VFSTestCase):
+    def load_expecting_exit(self, tar_path):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), self.assertRaises(SystemExit) as cm:
+            shell.VirtualFileSystem(tar_path)
+        self.assertEqual(cm.exception.code, 1)
+        self.assertEqual(out.getvalue(),
+                         f"Tar archive {tar_path} does not exist or is not a valid tar file.\n")
+
+    def test_missing_archive(self):
+        self.load_expecting_exit(os.path.join(self.tmp_dir, "missing.tar"))
+
+    def test_not_a_tar_file(self):
+        with open(self.tar_path, 'w') as f:
+            f.write("hostname: not a tar\n")
+        opened = []
+
+        def tracking_open(*args, **kwargs):
+            f = open(*args, **kwargs)
+            opened.append(f)
+            return f
+
+        with mock.patch.object(shell, 'open', create=True, side_effect=tracking_open):
+            self.load_expecting_exit(self.tar_path)
+        self.assertTrue(opened)
+        self.assertTrue(all(f.closed for f in opened))
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        shell._YAML_CACHE.clear()
+
+    def tearDown(self):
+        shell._YAML_CACHE.clear()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_config(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def load_config(self, path):
+        emulator = shell.ShellEmulator.__new__(shell.ShellEmulator)
+        emulator.load_config(path)
+        return emulator.config
+
+    def test_warm_hit_does_not_reparse(self):
+        path = self.write_config("c.yaml", "hostname: one\n")
+        with mock.patch.object(shell.yaml, 'load', wraps=shell.yaml.load) as load:
+            self.assertEqual(self.load_config(path), {'hostname': 'one'})
+            self.assertEqual(self.load_config(path), {'hostname': 'one'})
+        self.assertEqual(load.call_count, 1)
+
+    def test_mtime_change_invalidates(self):
+        path = self.write_config("c.yaml", "hostname: one\n")
+        self.load_config(path)
+        st = os.stat(path)
+        self.write_config("c.yaml", "hostname: two\n")
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+        self.assertEqual(self.load_config(path), {'hostname': 'two'})
+
+    def test_size_change_invalidates(self):
+        path = self.write_config("c.yaml", "hostname: one\n")
+        self.load_config(path)
+        st = os.stat(path)
+        self.write_config("c.yaml", "hostname: three\n")
+        os.utime(path, (st.st_atime, st.st_mtime))
+        self.assertEqual(self.load_config(path), {'hostname': 'three'})
+
+    def test_mutation_does_not_leak_into_cache(self):
+        path = self.write_config("c.yaml", "hostname: one\nlist: [1, 2]\n")
+        config = self.load_config(path)
+        config['hostname'] = 'changed'
+        config['list'].append(3)
+        self.assertEqual(self.load_config(path), {'hostname': 'one', 'list': [1, 2]})
+
+    def test_eviction_at_maxsize(self):
+        paths = [self.write_config(f"c{i}.yaml", f"hostname: h{i}\n") for i in range(3)]
+        with mock.patch.object(shell, '_YAML_CACHE_MAXSIZE', 2):
+            self.load_config(paths[0])
+            self.load_config(paths[1])
+            self.load_config(paths[0])
+            self.load_config(paths[2])
+        self.assertEqual(list(shell._YAML_CACHE), [paths[0], paths[2]])
+
+
 if __name__ == "__main__":
     unittest.main()